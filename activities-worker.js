@@ -0,0 +1,131 @@
+// Activities Web Worker
+// Downloads, parses and packs activities off the main thread so the map
+// stays responsive while a large history loads.
+//
+// Messages posted back to the page:
+//   { type: 'progress', text }          - status for the loading indicator
+//   { type: 'chunk', activities, coords, offsets, stats }
+//       activities - activity fields without coordinates/map_polyline
+//       coords     - Float32Array of lat, lng pairs for the whole chunk
+//       offsets    - Uint32Array; activity i owns points offsets[i]..offsets[i + 1]
+//       stats      - running totals over everything loaded so far
+//   { type: 'done', total }
+//   { type: 'error', message }
+// coords and offsets are transferred, not copied.
+
+const CHUNK_SIZE = 200;
+
+let excludedTypes = [];
+
+const stats = {
+    totalActivities: 0,
+    totalDistance: 0,
+    totalTime: 0,
+    totalElevation: 0,
+    typeCount: {},
+    latestDate: null
+};
+
+self.onmessage = async (event) => {
+    excludedTypes = event.data.excludedTypes || [];
+    try {
+        await load();
+    } catch (error) {
+        self.postMessage({ type: 'error', message: error.message });
+    }
+};
+
+function progress(text) {
+    self.postMessage({ type: 'progress', text });
+}
+
+async function load() {
+    progress('Downloading activities...');
+
+    // Sharded build (build_static.py): fetch the manifest, then the shards
+    // newest first so recent activities show up before older ones
+    const manifestResponse = await fetch('data/manifest.json', { cache: 'no-cache' });
+    if (manifestResponse.ok) {
+        const manifest = await manifestResponse.json();
+
+        for (let i = 0; i < manifest.shards.length; i++) {
+            const shard = manifest.shards[i];
+            progress(`Loading ${shard.key} (${i + 1}/${manifest.shards.length})...`);
+
+            const response = await fetch(shard.file);
+            if (!response.ok) {
+                throw new Error(`Could not load ${shard.file}`);
+            }
+            processBatch(await response.json());
+        }
+    } else {
+        // Unsharded: a single activities.json next to index.html
+        const response = await fetch('activities.json');
+        if (!response.ok) {
+            throw new Error('Could not load activities.json');
+        }
+
+        progress('Processing activities...');
+        processBatch(await response.json());
+    }
+
+    self.postMessage({ type: 'done', total: stats.totalActivities });
+}
+
+function processBatch(activities) {
+    for (let start = 0; start < activities.length; start += CHUNK_SIZE) {
+        postChunk(activities.slice(start, start + CHUNK_SIZE));
+    }
+}
+
+function postChunk(chunk) {
+    const metadata = [];
+    const tracks = [];
+    let pointCount = 0;
+
+    chunk.forEach(activity => {
+        const { coordinates, map_polyline, ...fields } = activity;
+        const sportType = activity.sport_type || activity.type;
+
+        // Statistics
+        stats.totalActivities++;
+        stats.totalDistance += activity.distance || 0;
+        stats.totalTime += activity.moving_time || 0;
+        stats.totalElevation += activity.total_elevation_gain || 0;
+        stats.typeCount[sportType] = (stats.typeCount[sportType] || 0) + 1;
+        if (activity.start_date && (!stats.latestDate || activity.start_date > stats.latestDate)) {
+            stats.latestDate = activity.start_date;
+        }
+
+        // Excluded types are never drawn, so don't ship their geometry
+        let track = [];
+        if (coordinates && coordinates.length > 0 && !excludedTypes.includes(sportType)) {
+            // Simplify: keep every 3rd point of long tracks
+            const skipFactor = coordinates.length > 100 ? 3 : 1;
+            track = coordinates.filter((coord, idx) => idx % skipFactor === 0);
+        }
+
+        metadata.push(fields);
+        tracks.push(track);
+        pointCount += track.length;
+    });
+
+    // Pack every track in the chunk into one buffer
+    const coords = new Float32Array(pointCount * 2);
+    const offsets = new Uint32Array(chunk.length + 1);
+    let point = 0;
+    tracks.forEach((track, i) => {
+        offsets[i] = point;
+        track.forEach(([lat, lng]) => {
+            coords[point * 2] = lat;
+            coords[point * 2 + 1] = lng;
+            point++;
+        });
+    });
+    offsets[chunk.length] = point;
+
+    self.postMessage(
+        { type: 'chunk', activities: metadata, coords, offsets, stats },
+        [coords.buffer, offsets.buffer]
+    );
+}
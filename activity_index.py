@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Activity Index
+Bitmap indexes over activities.json for fast faceted filtering.
+
+Every activity gets an ordinal (its position in activities.json) and every
+facet value gets a bitmap with one bit per ordinal, stored as a Python int.
+A query ORs the bitmaps of the values it accepts within each facet and ANDs
+the facets together, so filtering is a handful of big-integer operations
+instead of a walk over every activity.
+
+  sport_type               - one bitmap per type
+  date                     - one bitmap per month
+  distance / moving_time   - one bitmap per bucket (see the *_EDGES below)
+  city / state / country   - one bitmap per value
+
+Range facets OR together the buckets that lie completely inside the range
+and only check the activities in the two edge buckets one by one.
+
+The index is rebuilt by the fetch/sync scripts whenever activities.json is
+saved, and server.py uses it to answer /api/query. Run this script to
+rebuild it by hand.
+"""
+
+import os
+import pickle
+import numpy as np
+from activity_schema import load_activities
+
+INDEX_FILE = 'activities.idx'
+
+# Bucket boundaries for the range facets
+DISTANCE_EDGES = [0, 1000, 2000, 3000, 5000, 7500, 10000, 15000, 21098, 30000, 42196, 60000, 100000, 160000]
+DURATION_EDGES = [0, 600, 1200, 1800, 2700, 3600, 5400, 7200, 10800, 14400, 21600, 28800]
+
+LOCATION_FACETS = ['location_city', 'location_state', 'location_country']
+
+
+def bucket_of(value, edges):
+    """Index of the bucket value falls in: edges[i] <= value < edges[i + 1]."""
+    for i in range(len(edges) - 1, -1, -1):
+        if value >= edges[i]:
+            return i
+    return 0
+
+
+class ActivityIndex:
+    """Per-facet bitmaps over activity ordinals."""
+
+    def __init__(self, activities):
+        self.ids = [a['id'] for a in activities]
+        self.size = len(activities)
+        self.all = (1 << self.size) - 1
+
+        # Raw values, only used to resolve the edge buckets of range queries
+        self.start_dates = [a.get('start_date') or '' for a in activities]
+        self.distances = [a.get('distance') or 0 for a in activities]
+        self.moving_times = [a.get('moving_time') or 0 for a in activities]
+
+        self.sport_type = {}
+        self.month = {}
+        self.distance = [0] * len(DISTANCE_EDGES)
+        self.moving_time = [0] * len(DURATION_EDGES)
+        self.location = {facet: {} for facet in LOCATION_FACETS}
+
+        for ordinal, a in enumerate(activities):
+            bit = 1 << ordinal
+            sport_type = a.get('sport_type') or a.get('type') or ''
+            self.sport_type[sport_type] = self.sport_type.get(sport_type, 0) | bit
+            month = self.start_dates[ordinal][:7]
+            self.month[month] = self.month.get(month, 0) | bit
+            self.distance[bucket_of(self.distances[ordinal], DISTANCE_EDGES)] |= bit
+            self.moving_time[bucket_of(self.moving_times[ordinal], DURATION_EDGES)] |= bit
+            for facet in LOCATION_FACETS:
+                value = a.get(facet)
+                if value:
+                    self.location[facet][value] = self.location[facet].get(value, 0) | bit
+
+    # --- combining -------------------------------------------------------
+
+    def any_of(self, bitmaps, values):
+        """OR of the bitmaps for values; values missing from the facet match nothing."""
+        result = 0
+        for value in values:
+            result |= bitmaps.get(value, 0)
+        return result
+
+    def range_bitmap(self, buckets, edges, raw, low=None, high=None):
+        """Activities with low <= value <= high, using buckets from edges."""
+        if low is None and high is None:
+            return self.all
+
+        result = 0
+        edge_bits = 0
+        for i, bitmap in enumerate(buckets):
+            bucket_low = edges[i]
+            bucket_high = edges[i + 1] if i + 1 < len(edges) else float('inf')
+            if (high is not None and bucket_low > high) or (low is not None and bucket_high <= low):
+                continue
+            if (low is None or bucket_low >= low) and (high is None or bucket_high <= high):
+                result |= bitmap
+            else:
+                edge_bits |= bitmap
+
+        # Check the partially covered buckets one activity at a time
+        for ordinal in self.ordinals(edge_bits):
+            value = raw[ordinal]
+            if (low is None or value >= low) and (high is None or value <= high):
+                result |= 1 << ordinal
+        return result
+
+    def date_bitmap(self, after=None, before=None):
+        """Activities starting on or after `after` and before `before` (ISO dates)."""
+        if not after and not before:
+            return self.all
+
+        result = 0
+        edge_bits = 0
+        for month, bitmap in self.month.items():
+            if (after and month < after[:7]) or (before and month > before[:7]):
+                continue
+            if (after and month == after[:7]) or (before and month == before[:7]):
+                edge_bits |= bitmap
+            else:
+                result |= bitmap
+
+        for ordinal in self.ordinals(edge_bits):
+            start_date = self.start_dates[ordinal]
+            if (not after or start_date >= after) and (not before or start_date < before):
+                result |= 1 << ordinal
+        return result
+
+    def ordinals(self, bitmap):
+        """Ordinals of the set bits in bitmap, in ascending order."""
+        if not bitmap:
+            return []
+        raw = np.frombuffer(bitmap.to_bytes((self.size + 7) // 8, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, bitorder='little')).tolist()
+
+    # --- querying --------------------------------------------------------
+
+    def query(self, sport_types=None, after=None, before=None,
+              min_distance=None, max_distance=None, min_time=None, max_time=None,
+              locations=None, limit=None):
+        """
+        Filter activities. Within a facet the given values are ORed, across
+        facets they are ANDed. locations maps a LOCATION_FACETS name to the
+        values to accept. Raises ValueError if limit is negative.
+
+        Returns a dict with the matching ids (in activities.json order), their
+        count and the number of matches per sport type when the sport type
+        filter is ignored, so the UI can show counts next to every checkbox.
+        """
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit must not be negative, got {limit}")
+
+        others = self.all
+        others &= self.date_bitmap(after, before)
+        others &= self.range_bitmap(self.distance, DISTANCE_EDGES, self.distances, min_distance, max_distance)
+        others &= self.range_bitmap(self.moving_time, DURATION_EDGES, self.moving_times, min_time, max_time)
+        for facet, values in (locations or {}).items():
+            if values:
+                others &= self.any_of(self.location[facet], values)
+
+        result = others
+        if sport_types:
+            result &= self.any_of(self.sport_type, sport_types)
+
+        ordinals = self.ordinals(result)
+        if limit is not None:
+            ordinals = ordinals[:limit]
+
+        return {
+            'count': result.bit_count(),
+            'ids': [self.ids[ordinal] for ordinal in ordinals],
+            'sport_types': {
+                sport_type: count
+                for sport_type, bitmap in self.sport_type.items()
+                if (count := (bitmap & others).bit_count())
+            },
+        }
+
+
+def write_activity_index(activities, path=INDEX_FILE):
+    """Build the index for activities and save it to path."""
+    index = ActivityIndex(activities)
+    # Pickle the plain attributes so the file loads regardless of how this
+    # module was imported when it was written
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(vars(index), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return index
+
+
+def load_activity_index(path=INDEX_FILE):
+    index = ActivityIndex.__new__(ActivityIndex)
+    with open(path, 'rb') as f:
+        vars(index).update(pickle.load(f))
+    return index
+
+
+def open_activity_index(path=INDEX_FILE, current=None):
+    """Load path, reusing current if the file hasn't changed since it was loaded."""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    file_key = (stat.st_ino, stat.st_mtime_ns)
+    if current is not None and current.file_key == file_key:
+        return current
+    index = load_activity_index(path)
+    index.file_key = file_key
+    return index
+
+
+def main():
+    if not os.path.exists('activities.json'):
+        print("ERROR: activities.json not found. Run fetch_activities.py first.")
+        return
+
+    print("\n" + "="*60)
+    print("BUILDING ACTIVITY INDEX")
+    print("="*60)
+
+    activities = load_activities()
+
+    index = write_activity_index(activities)
+
+    print(f"\n✓ Indexed {index.size} activities")
+    print(f"✓ {len(index.sport_type)} sport types, {len(index.month)} months")
+    print(f"✓ Saved {INDEX_FILE}")
+
+if __name__ == '__main__':
+    main()
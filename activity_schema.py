@@ -0,0 +1,97 @@
+"""
+Activity Schema
+The one definition of an activity record, plus fast load/save helpers
+for activities.json built on msgspec.
+
+Records stay plain dicts (Activity is a TypedDict) so the rest of the code
+keeps using activity['distance'] and activity.get(...). Loading validates
+every record against the schema, and saving writes compact JSON with no
+indentation.
+
+Run benchmark_activities.py to compare against json.load/json.dump.
+"""
+
+import os
+from typing import List, Optional, Tuple, TypedDict
+import msgspec
+import polyline
+
+
+class Activity(TypedDict):
+    id: int
+    name: str
+    type: str
+    sport_type: str
+    start_date: str
+    distance: float
+    moving_time: int
+    elapsed_time: int
+    total_elevation_gain: float
+    start_latlng: Optional[List[float]]
+    end_latlng: Optional[List[float]]
+    location_city: Optional[str]
+    location_state: Optional[str]
+    location_country: Optional[str]
+    map_polyline: Optional[str]
+    coordinates: List[Tuple[float, float]]
+
+
+_decoder = msgspec.json.Decoder(List[Activity])
+_encoder = msgspec.json.Encoder()
+
+
+def activity_from_strava(activity, detailed):
+    """Build an Activity from a Strava summary and its detailed activity."""
+    activity_dict = {
+        'id': activity['id'],
+        'name': activity.get('name', ''),
+        'type': activity.get('type', ''),
+        'sport_type': activity.get('sport_type', activity.get('type', '')),
+        'start_date': activity.get('start_date', ''),
+        'distance': float(activity.get('distance', 0)),
+        'moving_time': int(activity.get('moving_time', 0)),
+        'elapsed_time': int(activity.get('elapsed_time', 0)),
+        'total_elevation_gain': float(activity.get('total_elevation_gain', 0)),
+        'start_latlng': activity.get('start_latlng'),
+        'end_latlng': activity.get('end_latlng'),
+        'location_city': activity.get('location_city'),
+        'location_state': activity.get('location_state'),
+        'location_country': activity.get('location_country'),
+        'map_polyline': None,
+        'coordinates': []
+    }
+
+    # Get polyline from map
+    if detailed.get('map') and detailed['map'].get('polyline'):
+        polyline_str = detailed['map']['polyline']
+        activity_dict['map_polyline'] = polyline_str
+        try:
+            activity_dict['coordinates'] = polyline.decode(polyline_str)
+        except Exception:
+            pass
+
+    return activity_dict
+
+
+def decode_activities(data):
+    """Decode and validate JSON bytes into a list of Activity dicts."""
+    return _decoder.decode(data)
+
+
+def encode_activities(activities):
+    """Encode activities as compact JSON bytes."""
+    return _encoder.encode(activities)
+
+
+def load_activities(path='activities.json'):
+    """Load and validate activities from path. Raises msgspec.ValidationError on bad records."""
+    with open(path, 'rb') as f:
+        return decode_activities(f.read())
+
+
+def write_activities(activities, path='activities.json'):
+    """Write activities to path as compact JSON, replacing the file atomically."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(encode_activities(activities))
+    os.replace(tmp_path, path)
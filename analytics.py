@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Activity Analytics
+Vectorized geodesic analytics over the tracks in activities.geo.
+
+For every activity with GPS data this computes, in batches across many
+activities at once:
+  - cumulative haversine distance along the track
+  - kilometer and mile split markers (where on the route each split falls;
+    positions only, no split times)
+  - bounding box and centroid
+  - estimated 1k, 5k, 10k and half marathon times from the average pace
+
+Strava's summary polylines carry no timestamps, so real best efforts
+(fastest rolling windows) can't be computed without fetching time streams.
+The estimates are just distance * moving_time / total distance, reported
+as estimated_from_avg_pace and never as best efforts.
+
+Results are cached per activity id in activities.analytics.json together
+with a fingerprint of the track, so only new or changed activities are
+recomputed. The first full run can be spread over a process pool; each
+worker maps the same geometry store, so the tracks are read from one
+shared page-cached copy.
+
+server.py serves per-sport records built from these at /api/records.
+
+Usage:
+    python analytics.py [--workers 4]
+"""
+
+import os
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import msgspec
+import numpy as np
+from activity_schema import load_activities
+from geometry_store import GeometryStore, GEOMETRY_FILE
+
+ANALYTICS_FILE = 'activities.analytics.json'
+CACHE_VERSION = 2
+
+EARTH_RADIUS_M = 6371008.8
+SPLIT_UNITS = {'km': 1000.0, 'mile': 1609.344}
+PACE_DISTANCES = {'1k': 1000.0, '5k': 5000.0, '10k': 10000.0, 'half_marathon': 21097.5}
+
+# Below this many activities to (re)compute, a pool costs more than it saves
+POOL_THRESHOLD = 2000
+POOL_CHUNK_SIZE = 500
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters between arrays of points in degrees."""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def fingerprint(store, activity):
+    """Changes whenever the track, distance or moving time of an activity changes."""
+    digest = hashlib.blake2b(store.deltas(activity['id']), digest_size=8)
+    digest.update(f"{activity.get('distance')}:{activity.get('moving_time')}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def split_markers(cumulative, points, size):
+    """Interpolated [lat, lng] of every full `size` meters along the track."""
+    marks = size * np.arange(1, int(cumulative[-1] // size) + 1)
+    if len(marks) == 0:
+        return []
+    # Clip in case rounding puts the last mark a hair past the final point
+    after = np.minimum(np.searchsorted(cumulative, marks), len(cumulative) - 1)
+    before = after - 1
+    span = cumulative[after] - cumulative[before]
+    fraction = np.divide(marks - cumulative[before], span, out=np.zeros_like(marks), where=span > 0)
+    latlngs = points[before] + fraction[:, None] * (points[after] - points[before])
+    return np.round(latlngs, 5).tolist()
+
+
+def analyze_batch(activities, tracks):
+    """
+    Analyze a batch of activities at once. tracks[i] is the (n, 2) lat/lng
+    array of activities[i] and must have at least one point.
+    """
+    lengths = np.array([len(track) for track in tracks])
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    points = np.concatenate(tracks)
+
+    # Distance of every step, zeroed where one activity ends and the next begins
+    steps = np.empty(len(points))
+    steps[0] = 0.0
+    steps[1:] = haversine(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+    steps[starts] = 0.0
+    cumulative = np.cumsum(steps)
+    cumulative -= np.repeat(cumulative[starts], lengths)
+
+    min_lat = np.minimum.reduceat(points[:, 0], starts)
+    max_lat = np.maximum.reduceat(points[:, 0], starts)
+    min_lng = np.minimum.reduceat(points[:, 1], starts)
+    max_lng = np.maximum.reduceat(points[:, 1], starts)
+    centroids = np.add.reduceat(points, starts) / lengths[:, None]
+
+    results = {}
+    for i, activity in enumerate(activities):
+        start, end = starts[i], starts[i] + lengths[i]
+        track_distance = float(cumulative[end - 1])
+
+        # Strava's distance comes from the full-resolution track, so prefer
+        # it over the simplified polyline when working out the pace
+        distance = activity.get('distance') or track_distance
+        moving_time = activity.get('moving_time') or 0
+        pace = moving_time / distance if distance > 0 and moving_time > 0 else None
+
+        results[activity['id']] = {
+            'track_distance': round(track_distance, 1),
+            'bbox': [round(float(v), 5) for v in (min_lat[i], min_lng[i], max_lat[i], max_lng[i])],
+            'centroid': np.round(centroids[i], 5).tolist(),
+            'splits': {
+                unit: split_markers(cumulative[start:end], points[start:end], size)
+                for unit, size in SPLIT_UNITS.items()
+            },
+            'estimated_from_avg_pace': {
+                name: round(size * pace)
+                for name, size in PACE_DISTANCES.items()
+                if pace is not None and distance >= size
+            },
+        }
+    return results
+
+
+def analyze_ids(store, activities):
+    """Analyze activities whose tracks are in store."""
+    if not activities:
+        return {}
+    return analyze_batch(activities, [store.coordinates(a['id']) for a in activities])
+
+
+def _analyze_chunk(task):
+    """Process pool worker: map the store and analyze one chunk."""
+    store_path, activities = task
+    with GeometryStore(store_path) as store:
+        return analyze_ids(store, activities)
+
+
+def load_analytics(path=ANALYTICS_FILE):
+    """Cached analytics by activity id; empty if the cache is missing, stale or unreadable."""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            try:
+                cache = msgspec.json.decode(f.read())
+            except msgspec.DecodeError:
+                # Recomputed and rewritten by the next update
+                return {}
+        if isinstance(cache, dict) and cache.get('version') == CACHE_VERSION:
+            # JSON object keys are strings, activity ids are ints
+            return {int(k): v for k, v in cache['activities'].items()}
+    return {}
+
+
+def update_analytics(activities, store_path=GEOMETRY_FILE, cache_path=ANALYTICS_FILE, workers=None, save=True):
+    """
+    Bring the analytics cache up to date with activities, recomputing only
+    new or changed tracks. Returns a dict of activity id -> analytics.
+
+    With save=False the cache is only read, never written (server.py).
+    """
+    if not os.path.exists(store_path):
+        return {}
+
+    cached = load_analytics(cache_path)
+    analytics = {}
+    stale = []
+
+    with GeometryStore(store_path) as store:
+        for activity in activities:
+            if activity['id'] not in store:
+                continue
+            key = fingerprint(store, activity)
+            entry = cached.get(activity['id'])
+            if entry is not None and entry['fingerprint'] == key:
+                analytics[activity['id']] = entry
+            else:
+                stale.append((activity, key))
+
+        if not stale and (len(analytics) == len(cached) or not save):
+            return analytics
+
+        # Only what the analysis needs, so pool tasks pickle quickly
+        todo = [
+            {'id': a['id'], 'distance': a.get('distance'), 'moving_time': a.get('moving_time')}
+            for a, _ in stale
+        ]
+        workers = workers or os.cpu_count() or 1
+
+        if workers > 1 and len(todo) >= POOL_THRESHOLD:
+            chunks = [todo[i:i + POOL_CHUNK_SIZE] for i in range(0, len(todo), POOL_CHUNK_SIZE)]
+            results = {}
+            with ProcessPoolExecutor(workers) as pool:
+                for chunk_results in pool.map(_analyze_chunk, [(store_path, chunk) for chunk in chunks]):
+                    results.update(chunk_results)
+        else:
+            results = analyze_ids(store, todo)
+
+    for activity, key in stale:
+        analytics[activity['id']] = dict(results[activity['id']], fingerprint=key)
+
+    if not save:
+        return analytics
+
+    # Write the whole cache; entries for deleted activities drop out here.
+    # Atomic replace via a per-process temp file, a sync and analytics.py
+    # may update the same cache at once
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(msgspec.json.encode({
+            'version': CACHE_VERSION,
+            'activities': {str(k): v for k, v in analytics.items()},
+        }))
+    os.replace(tmp_path, cache_path)
+
+    return analytics
+
+
+def personal_records(activities, analytics, sport_types=None):
+    """
+    Records per sport type: longest activity, most elevation gain and, for
+    each of PACE_DISTANCES, the activity at least that long with the fastest
+    average pace plus the time that pace gives over the distance. The latter
+    are estimates, not best efforts.
+    """
+    def summary(activity, **extra):
+        return {
+            'id': activity['id'],
+            'name': activity.get('name', ''),
+            'start_date': activity.get('start_date', ''),
+            **extra,
+        }
+
+    records = {}
+    for activity in activities:
+        sport_type = activity.get('sport_type') or activity.get('type') or ''
+        if sport_types and sport_type not in sport_types:
+            continue
+        sport = records.setdefault(sport_type, {'count': 0, 'longest': None, 'most_elevation': None, 'estimated_from_avg_pace': {}})
+        sport['count'] += 1
+
+        distance = activity.get('distance') or 0
+        if distance > 0 and (sport['longest'] is None or distance > sport['longest']['distance']):
+            sport['longest'] = summary(activity, distance=distance)
+
+        elevation = activity.get('total_elevation_gain') or 0
+        if elevation > 0 and (sport['most_elevation'] is None or elevation > sport['most_elevation']['elevation_gain']):
+            sport['most_elevation'] = summary(activity, elevation_gain=elevation)
+
+        entry = analytics.get(activity['id'])
+        if entry is None:
+            continue
+        for name, seconds in entry['estimated_from_avg_pace'].items():
+            best = sport['estimated_from_avg_pace'].get(name)
+            if best is None or seconds < best['time']:
+                sport['estimated_from_avg_pace'][name] = summary(activity, time=seconds)
+
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute splits, pace estimates and per-sport records.')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    if not os.path.exists('activities.json'):
+        print("ERROR: activities.json not found. Run fetch_activities.py first.")
+        return
+    if not os.path.exists(GEOMETRY_FILE):
+        print(f"ERROR: {GEOMETRY_FILE} not found. Run geometry_store.py first.")
+        return
+
+    print("\n" + "="*60)
+    print("ACTIVITY ANALYTICS")
+    print("="*60)
+
+    activities = load_activities()
+    analytics = update_analytics(activities, workers=args.workers)
+    records = personal_records(activities, analytics)
+
+    print(f"\n✓ Analyzed {len(analytics)} activities with GPS data")
+    print(f"✓ Saved {ANALYTICS_FILE}")
+
+    print("\n" + "="*60)
+    print("PERSONAL RECORDS")
+    print("="*60)
+
+    for sport_type, sport in sorted(records.items(), key=lambda x: x[1]['count'], reverse=True):
+        if not sport['estimated_from_avg_pace'] and not sport['longest']:
+            continue
+        print(f"\n{sport_type} ({sport['count']} activities)")
+        if sport['longest']:
+            print(f"  Longest: {sport['longest']['distance']/1000:.2f} km - {sport['longest']['name']}")
+        for name in PACE_DISTANCES:
+            best = sport['estimated_from_avg_pace'].get(name)
+            if best:
+                minutes, seconds = divmod(best['time'], 60)
+                print(f"  {name} (est. from avg pace): {minutes // 60}:{minutes % 60:02d}:{seconds:02d} - {best['name']}")
+
+if __name__ == '__main__':
+    main()
@@ -26,6 +26,11 @@ if [ $? -eq 0 ]; then
     echo ""
     echo "✅ Sync completed successfully!"
     
+    # Split activities into content-hashed shards so deploys only upload what changed
+    echo ""
+    echo "🧱 Building static site..."
+    python build_static.py
+    
     # Check which hosting method is being used
     if [ -f ".deploy-config" ]; then
         source .deploy-config
@@ -34,12 +39,12 @@ if [ $? -eq 0 ]; then
             "netlify-cli")
                 echo ""
                 echo "🚀 Deploying to Netlify..."
-                netlify deploy --prod --dir=.
+                netlify deploy --prod --dir=dist
                 ;;
             "vercel-cli")
                 echo ""
                 echo "🚀 Deploying to Vercel..."
-                vercel --prod
+                vercel deploy dist --prod
                 ;;
             "github")
                 echo ""
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark Activity Serialization
+Compares loading and saving a synthetic 10,000-activity file with the old
+json.load / json.dump(indent=2) path against activity_schema's msgspec
+decoder (with validation) and compact encoder.
+
+Usage:
+    python benchmark_activities.py [--activities 10000] [--points 300]
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from activity_schema import load_activities, write_activities
+
+SPORT_TYPES = ['Run', 'Ride', 'Walk', 'Hike', 'TrailRun', 'WeightTraining', 'Swim']
+
+
+def make_activities(count, points):
+    """Synthetic activities shaped like the ones the fetch scripts save."""
+    random.seed(42)
+    activities = []
+    for i in range(count):
+        sport_type = random.choice(SPORT_TYPES)
+        lat, lng = 45.5 + random.uniform(-1, 1), -122.6 + random.uniform(-1, 1)
+        coordinates = []
+        if sport_type not in ('WeightTraining', 'Swim'):
+            for _ in range(random.randint(points // 2, points * 3 // 2)):
+                lat += random.uniform(-0.0005, 0.0005)
+                lng += random.uniform(-0.0005, 0.0005)
+                coordinates.append((round(lat, 5), round(lng, 5)))
+        activities.append({
+            'id': 10_000_000_000 + i,
+            'name': f'{sport_type} #{i}',
+            'type': sport_type,
+            'sport_type': sport_type,
+            'start_date': f'20{10 + i % 15:02d}-{1 + i % 12:02d}-{1 + i % 28:02d}T07:00:00Z',
+            'distance': round(random.uniform(1000, 40000), 1),
+            'moving_time': random.randint(600, 10000),
+            'elapsed_time': random.randint(600, 12000),
+            'total_elevation_gain': round(random.uniform(0, 800), 1),
+            'start_latlng': list(coordinates[0]) if coordinates else [],
+            'end_latlng': list(coordinates[-1]) if coordinates else [],
+            'location_city': None,
+            'location_state': None,
+            'location_country': 'United States',
+            'map_polyline': None,
+            'coordinates': coordinates,
+        })
+    return activities
+
+
+def best_of(runs, fn):
+    """Fastest wall time of fn over several runs, in seconds."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark activities.json load/save.')
+    parser.add_argument('--activities', type=int, default=10000, help='number of activities (default: 10000)')
+    parser.add_argument('--points', type=int, default=300, help='average GPS points per activity (default: 300)')
+    parser.add_argument('--runs', type=int, default=3, help='runs per measurement, best is kept (default: 3)')
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("ACTIVITY SERIALIZATION BENCHMARK")
+    print("="*60)
+
+    activities = make_activities(args.activities, args.points)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'activities-json.json')
+        fast_path = os.path.join(tmp, 'activities-msgspec.json')
+
+        def json_save():
+            with open(json_path, 'w') as f:
+                json.dump(activities, f, indent=2)
+
+        def json_load():
+            with open(json_path, 'r') as f:
+                json.load(f)
+
+        json_save_time = best_of(args.runs, json_save)
+        json_load_time = best_of(args.runs, json_load)
+        fast_save_time = best_of(args.runs, lambda: write_activities(activities, fast_path))
+        fast_load_time = best_of(args.runs, lambda: load_activities(fast_path))
+
+        json_size = os.path.getsize(json_path)
+        fast_size = os.path.getsize(fast_path)
+
+    print(f"\n{args.activities} activities, ~{args.points} points each (best of {args.runs})\n")
+    print(f"  {'':24} {'json (indent=2)':>16} {'msgspec':>12} {'speedup':>9}")
+    print(f"  {'Load (+ validation)':24} {json_load_time * 1000:>13.0f} ms {fast_load_time * 1000:>9.0f} ms {json_load_time / fast_load_time:>8.1f}x")
+    print(f"  {'Save':24} {json_save_time * 1000:>13.0f} ms {fast_save_time * 1000:>9.0f} ms {json_save_time / fast_save_time:>8.1f}x")
+    print(f"  {'File size':24} {json_size / 1e6:>13.1f} MB {fast_size / 1e6:>9.1f} MB {json_size / fast_size:>8.1f}x")
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Build Static Site
+Writes a deployable copy of the map to dist/ with the activities split
+into per-year (or per-month) shards.
+
+Each shard's filename contains a hash of its contents, so a new activity
+only changes the current year's shard and the small manifest. Deploy
+tools that upload by file hash (Netlify, Vercel, GitHub Pages) then only
+re-upload those two files, and every other shard stays cached.
+
+dist/
+  index.html
+  activities-worker.js
+  _headers                            <- cache rules for Netlify
+  data/manifest.json                  <- list of shards, newest first
+  data/activities-2024.<hash>.json
+
+Usage:
+    python build_static.py [--by year|month] [--out dist]
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import argparse
+from activity_schema import load_activities, encode_activities
+
+OUTPUT_DIR = 'dist'
+DATA_DIR = 'data'
+MANIFEST_FILE = 'manifest.json'
+STATIC_FILES = ['index.html', 'activities-worker.js']
+
+# Hashed shards never change, the manifest must always be revalidated
+HEADERS = """/data/activities-*
+  Cache-Control: public, max-age=31536000, immutable
+/data/manifest.json
+  Cache-Control: no-cache
+/index.html
+  Cache-Control: no-cache
+/activities-worker.js
+  Cache-Control: no-cache
+"""
+
+
+def shard_key(activity, by):
+    """'2024' or '2024-05' for an activity, 'undated' if it has no date."""
+    start_date = activity.get('start_date') or ''
+    length = 4 if by == 'year' else 7
+    return start_date[:length] if len(start_date) >= length else 'undated'
+
+
+def write_if_changed(path, content):
+    """Write content to path unless it already holds exactly that."""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+    with open(path, 'wb') as f:
+        f.write(content)
+    return True
+
+
+def build(activities, out_dir=OUTPUT_DIR, by='year'):
+    """Build the static site. Returns (manifest, number of shards written)."""
+    data_dir = os.path.join(out_dir, DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+
+    activities = sorted(activities, key=lambda x: x.get('start_date', ''), reverse=True)
+
+    shards = {}
+    for activity in activities:
+        shards.setdefault(shard_key(activity, by), []).append(activity)
+
+    manifest = {
+        'version': 1,
+        'shard_by': by,
+        'total': len(activities),
+        'latest': activities[0].get('start_date') if activities else None,
+        'shards': [],
+    }
+    written = 0
+
+    # Newest first so the page can show recent activities before older ones load
+    for key in sorted(shards, key=lambda k: (k != 'undated', k), reverse=True):
+        content = encode_activities(shards[key])
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        filename = f'activities-{key}.{digest}.json'
+
+        if write_if_changed(os.path.join(data_dir, filename), content):
+            written += 1
+
+        manifest['shards'].append({
+            'key': key,
+            'file': f'{DATA_DIR}/{filename}',
+            'count': len(shards[key]),
+            'bytes': len(content),
+        })
+
+    write_if_changed(
+        os.path.join(data_dir, MANIFEST_FILE),
+        json.dumps(manifest, indent=2).encode('utf-8')
+    )
+
+    # Drop shards that are no longer referenced
+    current = {os.path.basename(shard['file']) for shard in manifest['shards']}
+    for filename in os.listdir(data_dir):
+        if filename.startswith('activities-') and filename not in current:
+            os.remove(os.path.join(data_dir, filename))
+
+    for filename in STATIC_FILES:
+        if os.path.exists(filename):
+            shutil.copyfile(filename, os.path.join(out_dir, filename))
+    write_if_changed(os.path.join(out_dir, '_headers'), HEADERS.encode('utf-8'))
+
+    return manifest, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the sharded static site.')
+    parser.add_argument('--by', choices=['year', 'month'], default='year', help='shard size (default: year)')
+    parser.add_argument('--out', default=OUTPUT_DIR, help='output directory (default: dist)')
+    args = parser.parse_args()
+
+    if not os.path.exists('activities.json'):
+        print("ERROR: activities.json not found. Run fetch_activities.py first.")
+        return
+
+    print("\n" + "="*60)
+    print("BUILDING STATIC SITE")
+    print("="*60)
+
+    activities = load_activities()
+
+    manifest, written = build(activities, args.out, args.by)
+
+    print(f"\n✓ {manifest['total']} activities in {len(manifest['shards'])} shards")
+    print(f"✓ {written} shard(s) changed since the last build")
+    print(f"✓ Site written to {args.out}/")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Club Sync
+Syncs activities for every athlete in a club roster in one run.
+
+Athletes are sharded across worker processes. Every API request first
+takes a slot from a central rate budget shared by all workers, so the
+Strava limits of each app (and optional per-token caps) are never
+exceeded no matter how many workers are running. Each athlete's data is
+written to its own partition: athletes/<athlete id>/activities.json
+(plus the matching activities.geo geometry store).
+
+The roster lives in athletes.json (see athletes.example.json). Each app
+needs its client_id and client_secret, and each athlete the tokens from
+running authenticate.py with that app. Access tokens expire after six
+hours; they are refreshed when expired (or rejected with a 401) and the
+new tokens are saved back to the roster.
+
+Usage:
+    python club_sync.py [--roster athletes.json] [--workers 8]
+"""
+
+import os
+import json
+import time
+import argparse
+import multiprocessing
+import requests
+from sync_activities import load_existing_activities, save_activities, fetch_new_activities
+
+# Disable SSL warnings
+import urllib3
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+ROSTER_FILE = 'athletes.json'
+PARTITION_DIR = 'athletes'
+
+TOKEN_URL = 'https://www.strava.com/oauth/token'
+
+# Strava's default per-app limits
+DEFAULT_LIMIT_15MIN = 100
+DEFAULT_LIMIT_DAILY = 1000
+
+
+class BudgetExhausted(requests.exceptions.HTTPError):
+    """Raised when a daily budget is used up; reads like a 429 to the fetch loop."""
+
+
+class RateBudget:
+    """
+    Request budget shared by all worker processes.
+
+    Usage is tracked per key ('app:<name>' and 'token:<athlete id>') in a
+    Manager dict, in the same windows Strava uses: 15-minute blocks starting
+    on the quarter hour and UTC days.
+    """
+
+    def __init__(self, manager, limits):
+        self.limits = limits  # key -> (limit_15min, limit_daily)
+        self.usage = manager.dict()  # key -> (window, count_15min, day, count_daily)
+        self.lock = manager.Lock()
+
+    def _current(self, key, now):
+        window, day = int(now // 900), int(now // 86400)
+        old_window, count_15min, old_day, count_daily = self.usage.get(key, (window, 0, day, 0))
+        if old_window != window:
+            count_15min = 0
+        if old_day != day:
+            count_daily = 0
+        return window, count_15min, day, count_daily
+
+    def acquire(self, keys):
+        """Block until every key has room for one more request, then take it."""
+        while True:
+            now = time.time()
+            with self.lock:
+                current = {key: self._current(key, now) for key in keys}
+                if any(current[key][3] >= self.limits[key][1] for key in keys):
+                    raise BudgetExhausted("429 Client Error: daily rate budget exhausted")
+                if all(current[key][1] < self.limits[key][0] for key in keys):
+                    for key, (window, count_15min, day, count_daily) in current.items():
+                        self.usage[key] = (window, count_15min + 1, day, count_daily + 1)
+                    return
+
+            # Sleep until the next quarter hour, when the 15-minute windows reset
+            time.sleep(900 - now % 900 + 1)
+
+    def record_usage(self, key, response):
+        """Sync an app's counters with the usage Strava reports back."""
+        usage = response.headers.get('X-RateLimit-Usage')
+        if not usage:
+            return
+        try:
+            used_15min, used_daily = (int(n) for n in usage.split(',')[:2])
+        except ValueError:
+            return
+
+        with self.lock:
+            window, count_15min, day, count_daily = self._current(key, time.time())
+            self.usage[key] = (window, max(count_15min, used_15min), day, max(count_daily, used_daily))
+
+
+def load_roster(path=ROSTER_FILE):
+    """Load the roster and build the rate limits for every app and token."""
+    with open(path, 'r') as f:
+        roster = json.load(f)
+
+    apps = roster.get('apps', {'default': {}})
+    limits = {}
+    for name, app in apps.items():
+        limits[f'app:{name}'] = (
+            app.get('limit_15min', DEFAULT_LIMIT_15MIN),
+            app.get('limit_daily', DEFAULT_LIMIT_DAILY),
+        )
+
+    athletes = roster.get('athletes', [])
+    for athlete in athletes:
+        athlete.setdefault('app', 'default')
+        if f"app:{athlete['app']}" not in limits:
+            raise ValueError(f"Athlete {athlete['id']} uses unknown app '{athlete['app']}'")
+        app_limit_15min, app_limit_daily = limits[f"app:{athlete['app']}"]
+        limits[f"token:{athlete['id']}"] = (
+            athlete.get('limit_15min', app_limit_15min),
+            athlete.get('limit_daily', app_limit_daily),
+        )
+        # Workers need the app credentials to refresh the athlete's token
+        athlete['client_id'] = apps[athlete['app']].get('client_id')
+        athlete['client_secret'] = apps[athlete['app']].get('client_secret')
+
+    return athletes, limits
+
+
+def save_athlete_tokens(path, athlete_id, tokens, lock):
+    """Write an athlete's refreshed tokens back to the roster."""
+    with lock:
+        with open(path, 'r') as f:
+            roster = json.load(f)
+        for athlete in roster.get('athletes', []):
+            if athlete['id'] == athlete_id:
+                athlete['access_token'] = tokens['access_token']
+                athlete['refresh_token'] = tokens['refresh_token']
+                athlete['expires_at'] = tokens['expires_at']
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(roster, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def refresh_athlete_token(athlete):
+    """Exchange the athlete's refresh token for new tokens, same as sync_daemon does for .env."""
+    if not (athlete.get('refresh_token') and athlete.get('client_id') and athlete.get('client_secret')):
+        raise ValueError("token expired and no refresh_token/client_secret to renew it")
+
+    response = requests.post(
+        TOKEN_URL,
+        data={
+            'client_id': athlete['client_id'],
+            'client_secret': athlete['client_secret'],
+            'refresh_token': athlete['refresh_token'],
+            'grant_type': 'refresh_token',
+        },
+        verify=False
+    )
+    response.raise_for_status()
+    tokens = response.json()
+
+    athlete['access_token'] = tokens['access_token']
+    athlete['refresh_token'] = tokens['refresh_token']
+    athlete['expires_at'] = tokens['expires_at']
+    return tokens
+
+
+def sync_athlete(task):
+    """Worker: sync one athlete's partition. Returns a summary dict."""
+    athlete, budget, roster_path, roster_lock = task
+    athlete_id = athlete['id']
+    app_key = f"app:{athlete['app']}"
+    keys = (app_key, f'token:{athlete_id}')
+
+    def refresh():
+        tokens = refresh_athlete_token(athlete)
+        save_athlete_tokens(roster_path, athlete_id, tokens, roster_lock)
+        log("Refreshed access token")
+
+    def budgeted_get(*args, **kwargs):
+        # Refresh a minute early so a token can't expire mid-request
+        if athlete.get('refresh_token') and athlete.get('expires_at', 0) < time.time() + 60:
+            refresh()
+        for attempt in range(2):
+            kwargs['headers'] = {'Authorization': f"Bearer {athlete['access_token']}"}
+            budget.acquire(keys)
+            response = requests.get(*args, **kwargs)
+            budget.record_usage(app_key, response)
+            if response.status_code != 401 or attempt == 1:
+                return response
+            refresh()
+
+    def log(message):
+        print(f"[{athlete_id}] {message.strip()}", flush=True)
+
+    partition = os.path.join(PARTITION_DIR, str(athlete_id))
+    os.makedirs(partition, exist_ok=True)
+    path = os.path.join(partition, 'activities.json')
+
+    # Any failure stays with this athlete; the rest of the club keeps syncing
+    try:
+        existing_activities = load_existing_activities(path)
+    except Exception as e:
+        return {'id': athlete_id, 'new': 0, 'total': 0, 'error': f"could not read {path}: {e}"}
+
+    try:
+        new_activities, rate_limited = fetch_new_activities(
+            athlete['access_token'], existing_activities, get=budgeted_get, log=log
+        )
+    except Exception as e:
+        return {'id': athlete_id, 'new': 0, 'total': len(existing_activities), 'error': str(e)}
+
+    if new_activities:
+        try:
+            # Pool workers are daemonic and can't start the analytics pool
+            save_activities(existing_activities + new_activities, path, workers=1)
+        except Exception as e:
+            return {'id': athlete_id, 'new': 0, 'total': len(existing_activities), 'error': f"could not save {path}: {e}"}
+
+    return {
+        'id': athlete_id,
+        'new': len(new_activities),
+        'total': len(existing_activities) + len(new_activities),
+        'rate_limited': rate_limited,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync activities for every athlete in a club roster.')
+    parser.add_argument('--roster', default=ROSTER_FILE, help='roster file (default: athletes.json)')
+    parser.add_argument('--workers', type=int, default=8, help='worker processes (default: 8)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.roster):
+        print(f"ERROR: {args.roster} not found. Copy athletes.example.json and fill in your club.")
+        return
+
+    athletes, limits = load_roster(args.roster)
+
+    print("\n" + "="*60)
+    print("SYNCING CLUB ACTIVITIES")
+    print("="*60)
+    print(f"\nAthletes: {len(athletes)}")
+
+    if not athletes:
+        return
+
+    workers = max(1, min(args.workers, len(athletes)))
+    print(f"Workers: {workers}\n")
+
+    results = []
+    with multiprocessing.Manager() as manager:
+        budget = RateBudget(manager, limits)
+        roster_lock = manager.Lock()
+        with multiprocessing.Pool(workers) as pool:
+            tasks = [(athlete, budget, args.roster, roster_lock) for athlete in athletes]
+            for result in pool.imap_unordered(sync_athlete, tasks):
+                results.append(result)
+
+    print("\n" + "="*60)
+    print("SUMMARY")
+    print("="*60 + "\n")
+
+    for result in sorted(results, key=lambda r: str(r['id'])):
+        if result.get('error'):
+            status = f"ERROR: {result['error']}"
+        elif result['rate_limited']:
+            status = "rate limited, run again later for the rest"
+        else:
+            status = "up to date"
+        print(f"  {result['id']}: +{result['new']} new, {result['total']} total ({status})")
+
+    total_new = sum(r['new'] for r in results)
+    print(f"\n✓ Synced {total_new} new activities across {len(results)} athletes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Enrich Activity Locations
+Strava usually leaves location_city/location_state/location_country empty,
+so this fills them in from each activity's start_latlng using an offline
+GeoNames gazetteer (every place with a population of 1000+).
+
+The gazetteer is downloaded once into gazetteer/ and turned into a KD-tree
+that is cached on disk, so after that no network access is needed. Start
+points are looked up in one batch per run, and results are memoized per
+~1 km grid cell in location_cache.json: a later sync only has to look up
+cells it hasn't seen before.
+
+sync_activities.py runs this automatically once the gazetteer has been
+downloaded.
+
+Usage:
+    python enrich_locations.py
+"""
+
+import io
+import os
+import json
+import pickle
+import zipfile
+import requests
+import numpy as np
+from scipy.spatial import cKDTree
+from activity_schema import load_activities, write_activities
+from activity_index import write_activity_index
+
+GAZETTEER_DIR = 'gazetteer'
+GEONAMES_URL = 'https://download.geonames.org/export/dump/'
+CITIES_FILE = 'cities1000'
+GAZETTEER_CACHE = os.path.join(GAZETTEER_DIR, f'{CITIES_FILE}.pkl')
+LOCATION_CACHE = 'location_cache.json'
+
+CELL_SIZE = 0.01  # degrees, roughly 1 km
+MAX_DISTANCE_KM = 50  # beyond this, leave the location empty (e.g. at sea)
+EARTH_RADIUS_KM = 6371.0
+
+
+def to_unit_vectors(latlngs):
+    """Convert (n, 2) lat/lng degrees to points on the unit sphere."""
+    lat = np.radians(latlngs[:, 0])
+    lng = np.radians(latlngs[:, 1])
+    return np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+
+def download_gazetteer():
+    """Download the GeoNames files the gazetteer is built from."""
+    os.makedirs(GAZETTEER_DIR, exist_ok=True)
+
+    print(f"Downloading {CITIES_FILE}.zip from GeoNames...")
+    response = requests.get(f'{GEONAMES_URL}{CITIES_FILE}.zip', timeout=120)
+    response.raise_for_status()
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        archive.extract(f'{CITIES_FILE}.txt', GAZETTEER_DIR)
+
+    for filename in ['admin1CodesASCII.txt', 'countryInfo.txt']:
+        print(f"Downloading {filename} from GeoNames...")
+        response = requests.get(f'{GEONAMES_URL}{filename}', timeout=120)
+        response.raise_for_status()
+        with open(os.path.join(GAZETTEER_DIR, filename), 'wb') as f:
+            f.write(response.content)
+
+
+def gazetteer_available():
+    """True if the gazetteer has been downloaded (or already built)."""
+    return os.path.exists(GAZETTEER_CACHE) or os.path.exists(os.path.join(GAZETTEER_DIR, f'{CITIES_FILE}.txt'))
+
+
+class Gazetteer:
+    """Nearest-place lookup over the GeoNames cities file."""
+
+    def __init__(self, tree, cities, states, countries):
+        self.tree = tree
+        self.cities = cities
+        self.states = states
+        self.countries = countries
+
+    @classmethod
+    def build(cls):
+        """Parse the GeoNames files and build the KD-tree."""
+        countries = {}
+        with open(os.path.join(GAZETTEER_DIR, 'countryInfo.txt'), 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#'):
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) > 4:
+                    countries[fields[0]] = fields[4]
+
+        admin1 = {}
+        with open(os.path.join(GAZETTEER_DIR, 'admin1CodesASCII.txt'), 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) > 1:
+                    admin1[fields[0]] = fields[1]
+
+        latlngs, cities, states, country_names = [], [], [], []
+        with open(os.path.join(GAZETTEER_DIR, f'{CITIES_FILE}.txt'), 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) < 11:
+                    continue
+                country_code, admin1_code = fields[8], fields[10]
+                latlngs.append((float(fields[4]), float(fields[5])))
+                cities.append(fields[1])
+                states.append(admin1.get(f'{country_code}.{admin1_code}'))
+                country_names.append(countries.get(country_code, country_code))
+
+        tree = cKDTree(to_unit_vectors(np.array(latlngs, dtype=np.float64)))
+        return cls(tree, cities, states, country_names)
+
+    @classmethod
+    def load(cls):
+        """Load the cached gazetteer, building (and caching) it on first use."""
+        # Cache plain data rather than the class, which may be pickled as
+        # __main__.Gazetteer when this file runs as a script
+        if os.path.exists(GAZETTEER_CACHE):
+            with open(GAZETTEER_CACHE, 'rb') as f:
+                return cls(*pickle.load(f))
+
+        gazetteer = cls.build()
+
+        # Atomic replace, club_sync.py workers may build it at the same time
+        tmp_path = f'{GAZETTEER_CACHE}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(
+                (gazetteer.tree, gazetteer.cities, gazetteer.states, gazetteer.countries),
+                f, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(tmp_path, GAZETTEER_CACHE)
+        return gazetteer
+
+    def lookup(self, latlngs):
+        """
+        Nearest place for each row of an (n, 2) lat/lng array, as a list of
+        [city, state, country] or None where nothing is within MAX_DISTANCE_KM.
+        """
+        if len(latlngs) == 0:
+            return []
+
+        chord, rows = self.tree.query(to_unit_vectors(latlngs))
+        distance_km = 2 * np.arcsin(np.minimum(chord / 2, 1.0)) * EARTH_RADIUS_KM
+
+        return [
+            [self.cities[row], self.states[row], self.countries[row]] if km <= MAX_DISTANCE_KM else None
+            for row, km in zip(rows.tolist(), distance_km.tolist())
+        ]
+
+
+# Loaded once per process, so the daemon and club_sync workers don't
+# unpickle the whole gazetteer on every save
+gazetteer = None
+
+def get_gazetteer():
+    """Return the gazetteer, loading it on first use."""
+    global gazetteer
+    if gazetteer is None:
+        gazetteer = Gazetteer.load()
+    return gazetteer
+
+
+def cell_key(latlng):
+    """Grid cell an activity start point falls in, e.g. '4552,-12268'."""
+    return f'{round(latlng[0] / CELL_SIZE)},{round(latlng[1] / CELL_SIZE)}'
+
+
+def load_location_cache(path=LOCATION_CACHE):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            cache = json.load(f)
+        if cache.get('gazetteer') == CITIES_FILE:
+            return cache['cells']
+    return {}
+
+
+def enrich_activities(activities, cache_path=LOCATION_CACHE):
+    """
+    Fill in empty location fields from start_latlng. Modifies activities
+    in place and returns the number of activities that were updated.
+    """
+    pending = [
+        a for a in activities
+        if not a.get('location_city') and a.get('start_latlng') and len(a['start_latlng']) == 2
+    ]
+    if not pending:
+        return 0
+
+    cells = load_location_cache(cache_path)
+
+    # Look up every cell we haven't seen before in a single batch
+    missing = sorted({cell_key(a['start_latlng']) for a in pending} - cells.keys())
+    if missing:
+        centers = np.array([[int(n) * CELL_SIZE for n in key.split(',')] for key in missing], dtype=np.float64)
+        for key, place in zip(missing, get_gazetteer().lookup(centers)):
+            cells[key] = place
+
+        # Atomic replace, club_sync.py workers may share the same cache
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'gazetteer': CITIES_FILE, 'cells': cells}, f)
+        os.replace(tmp_path, cache_path)
+
+    updated = 0
+    for activity in pending:
+        place = cells.get(cell_key(activity['start_latlng']))
+        if place is None:
+            continue
+        city, state, country = place
+        activity['location_city'] = city
+        activity['location_state'] = activity.get('location_state') or state
+        activity['location_country'] = activity.get('location_country') or country
+        updated += 1
+
+    return updated
+
+
+def main():
+    if not os.path.exists('activities.json'):
+        print("ERROR: activities.json not found. Run fetch_activities.py first.")
+        return
+
+    print("\n" + "="*60)
+    print("ENRICHING ACTIVITY LOCATIONS")
+    print("="*60 + "\n")
+
+    if not gazetteer_available():
+        try:
+            download_gazetteer()
+        except Exception as e:
+            print(f"ERROR: Could not download the gazetteer: {e}")
+            return
+
+    activities = load_activities()
+
+    updated = enrich_activities(activities)
+
+    if updated:
+        write_activities(activities)
+        # Keep /api/query's location facets in step with the new fields
+        write_activity_index(activities)
+
+    with_location = sum(1 for a in activities if a.get('location_city'))
+    print(f"\n✓ Added locations to {updated} activities")
+    print(f"✓ Activities with a location: {with_location}/{len(activities)}")
+
+if __name__ == '__main__':
+    main()
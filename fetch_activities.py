@@ -5,12 +5,12 @@ This script fetches all your Strava activities and saves them to a JSON file.
 """
 
 import os
-import json
 import time
 import requests
 from datetime import datetime
 from dotenv import load_dotenv
-import polyline
+from activity_schema import activity_from_strava
+from sync_activities import save_activities
 
 # Disable SSL warnings
 import urllib3
@@ -89,35 +89,7 @@ def fetch_activities():
                     detail_response.raise_for_status()
                     detailed = detail_response.json()
                     
-                    activity_dict = {
-                        'id': activity_id,
-                        'name': activity.get('name', ''),
-                        'type': activity.get('type', ''),
-                        'sport_type': activity.get('sport_type', activity.get('type', '')),
-                        'start_date': activity.get('start_date', ''),
-                        'distance': float(activity.get('distance', 0)),
-                        'moving_time': int(activity.get('moving_time', 0)),
-                        'elapsed_time': int(activity.get('elapsed_time', 0)),
-                        'total_elevation_gain': float(activity.get('total_elevation_gain', 0)),
-                        'start_latlng': activity.get('start_latlng'),
-                        'end_latlng': activity.get('end_latlng'),
-                        'location_city': activity.get('location_city'),
-                        'location_state': activity.get('location_state'),
-                        'location_country': activity.get('location_country'),
-                        'map_polyline': None,
-                        'coordinates': []
-                    }
-                    
-                    # Get polyline from map
-                    if detailed.get('map') and detailed['map'].get('polyline'):
-                        polyline_str = detailed['map']['polyline']
-                        activity_dict['map_polyline'] = polyline_str
-                        
-                        try:
-                            coords = polyline.decode(polyline_str)
-                            activity_dict['coordinates'] = coords
-                        except:
-                            pass
+                    activity_dict = activity_from_strava(activity, detailed)
                     
                     activities_data.append(activity_dict)
                     
@@ -141,8 +113,7 @@ def fetch_activities():
     
     # Save to JSON file
     output_file = 'activities.json'
-    with open(output_file, 'w') as f:
-        json.dump(activities_data, f, indent=2)
+    save_activities(activities_data, output_file)
     
     print(f"✓ Saved activities to {output_file}")
     
@@ -5,11 +5,11 @@ This script fetches ALL your activities, handling rate limits gracefully.
 """
 
 import os
-import json
 import time
 import requests
 from dotenv import load_dotenv
-import polyline
+from activity_schema import activity_from_strava
+from sync_activities import load_existing_activities, save_activities
 
 # Disable SSL warnings
 import urllib3
@@ -30,10 +30,7 @@ def fetch_all_activities():
     print("="*60)
     
     # Load existing activities
-    existing_activities = []
-    if os.path.exists('activities.json'):
-        with open('activities.json', 'r') as f:
-            existing_activities = json.load(f)
+    existing_activities = load_existing_activities()
     
     existing_ids = {a['id'] for a in existing_activities}
     print(f"\nExisting activities in database: {len(existing_activities)}")
@@ -88,34 +85,7 @@ def fetch_all_activities():
                         detail_response.raise_for_status()
                         detailed = detail_response.json()
                         
-                        activity_dict = {
-                            'id': activity_id,
-                            'name': activity.get('name', ''),
-                            'type': activity.get('type', ''),
-                            'sport_type': activity.get('sport_type', activity.get('type', '')),
-                            'start_date': activity.get('start_date', ''),
-                            'distance': float(activity.get('distance', 0)),
-                            'moving_time': int(activity.get('moving_time', 0)),
-                            'elapsed_time': int(activity.get('elapsed_time', 0)),
-                            'total_elevation_gain': float(activity.get('total_elevation_gain', 0)),
-                            'start_latlng': activity.get('start_latlng'),
-                            'end_latlng': activity.get('end_latlng'),
-                            'location_city': activity.get('location_city'),
-                            'location_state': activity.get('location_state'),
-                            'location_country': activity.get('location_country'),
-                            'map_polyline': None,
-                            'coordinates': []
-                        }
-                        
-                        # Get polyline
-                        if detailed.get('map') and detailed['map'].get('polyline'):
-                            polyline_str = detailed['map']['polyline']
-                            activity_dict['map_polyline'] = polyline_str
-                            try:
-                                coords = polyline.decode(polyline_str)
-                                activity_dict['coordinates'] = coords
-                            except:
-                                pass
+                        activity_dict = activity_from_strava(activity, detailed)
                         
                         all_activities.append(activity_dict)
                         existing_ids.add(activity_id)
@@ -143,9 +113,7 @@ def fetch_all_activities():
                     print(f"   Saving progress...")
                     
                     # Save what we have
-                    all_activities.sort(key=lambda x: x.get('start_date', ''), reverse=True)
-                    with open('activities.json', 'w') as f:
-                        json.dump(all_activities, f, indent=2)
+                    save_activities(all_activities)
                     
                     print(f"   ✓ Saved {len(all_activities)} total activities")
                     print(f"\n   📋 TO CONTINUE:")
@@ -157,9 +125,7 @@ def fetch_all_activities():
                     raise e
         
         # Save final result
-        all_activities.sort(key=lambda x: x.get('start_date', ''), reverse=True)
-        with open('activities.json', 'w') as f:
-            json.dump(all_activities, f, indent=2)
+        save_activities(all_activities)
         
         print(f"\n" + "="*60)
         print("SUCCESS! ALL ACTIVITIES FETCHED")
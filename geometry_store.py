@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Geometry Store
+Packs the GPS tracks from activities.json into a compact binary file
+(activities.geo) that the server and batch jobs can open with mmap.
+
+File layout (all little-endian):
+  header  - magic b'SWMG', version (uint32), activity count (uint32)
+  index   - one INDEX_DTYPE row per activity, sorted by activity id
+  points  - int32 (lat, lng) pairs scaled by 1e7; the first point of each
+            activity is absolute, every following point is a delta from the
+            previous one. Deltas wrap modulo 2**32 (a jump across the
+            antimeridian doesn't fit in int32), so decode with int32 sums.
+
+Run this script to rebuild the store by hand. The fetch/sync scripts
+rebuild it automatically after saving activities.json.
+"""
+
+import os
+import mmap
+import struct
+import numpy as np
+from activity_schema import load_activities
+
+GEOMETRY_FILE = 'activities.geo'
+
+MAGIC = b'SWMG'
+VERSION = 1
+HEADER = struct.Struct('<4sII')
+SCALE = 1e7
+
+INDEX_DTYPE = np.dtype([
+    ('id', '<i8'),
+    ('offset', '<i8'),
+    ('count', '<i4'),
+    ('reserved', '<i4'),
+])
+
+
+def encode_coordinates(coordinates):
+    """Convert [[lat, lng], ...] to delta-encoded int32 E7 pairs."""
+    points = np.rint(np.asarray(coordinates, dtype=np.float64) * SCALE).astype(np.int32)
+    deltas = points.copy()
+    # int32 subtraction wraps; coordinates() relies on that to decode
+    deltas[1:] -= points[:-1]
+    return deltas
+
+
+def write_geometry_store(activities, path=GEOMETRY_FILE):
+    """Write the coordinates of all activities with GPS data to path."""
+    tracks = sorted(
+        (a['id'], a['coordinates']) for a in activities if a.get('coordinates')
+    )
+
+    index = np.zeros(len(tracks), dtype=INDEX_DTYPE)
+    offset = HEADER.size + index.nbytes
+    chunks = []
+
+    for row, (activity_id, coordinates) in enumerate(tracks):
+        deltas = encode_coordinates(coordinates)
+        index[row] = (activity_id, offset, len(deltas), 0)
+        chunks.append(deltas)
+        offset += deltas.nbytes
+
+    # Write to a temp file and swap it in so readers that still have the
+    # old file mapped keep a consistent view.
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(tracks)))
+        f.write(index.tobytes())
+        for deltas in chunks:
+            f.write(deltas.tobytes())
+    os.replace(tmp_path, path)
+
+    return len(tracks)
+
+
+class GeometryStore:
+    """Read-only, memory-mapped view of an activities.geo file."""
+
+    def __init__(self, path=GEOMETRY_FILE):
+        self.path = path
+        self._file = open(path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self.file_key = (stat.st_ino, stat.st_mtime_ns)
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} geometry store")
+
+        self.index = np.frombuffer(self._mm, dtype=INDEX_DTYPE, count=count, offset=HEADER.size)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, activity_id):
+        return self._row(activity_id) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def ids(self):
+        """Activity ids in the store, in ascending order."""
+        return self.index['id']
+
+    def _row(self, activity_id):
+        ids = self.index['id']
+        row = int(np.searchsorted(ids, activity_id))
+        if row < len(ids) and ids[row] == activity_id:
+            return row
+        return None
+
+    def deltas(self, activity_id):
+        """Zero-copy (n, 2) int32 view of the raw delta-encoded points."""
+        row = self._row(activity_id)
+        if row is None:
+            raise KeyError(activity_id)
+        entry = self.index[row]
+        return np.frombuffer(
+            self._mm, dtype='<i4', count=int(entry['count']) * 2, offset=int(entry['offset'])
+        ).reshape(-1, 2)
+
+    def coordinates(self, activity_id):
+        """Decoded (n, 2) float64 array of [lat, lng] in degrees."""
+        # Summing in int32 undoes the wraparound of deltas across the antimeridian
+        return np.cumsum(self.deltas(activity_id), axis=0, dtype=np.int32) / SCALE
+
+    def close(self):
+        # Views handed out by deltas() keep the mapping alive, so only drop
+        # our own references and let the GC unmap once they are gone.
+        self.index = None
+        self._mm = None
+        self._file.close()
+
+
+def open_geometry_store(path=GEOMETRY_FILE, current=None):
+    """Open path, reusing current if the file hasn't changed since it was mapped."""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    if current is not None and current.file_key == (stat.st_ino, stat.st_mtime_ns):
+        return current
+    return GeometryStore(path)
+
+
+def main():
+    if not os.path.exists('activities.json'):
+        print("ERROR: activities.json not found. Run fetch_activities.py first.")
+        return
+
+    print("\n" + "="*60)
+    print("BUILDING GEOMETRY STORE")
+    print("="*60)
+
+    activities = load_activities()
+
+    count = write_geometry_store(activities)
+    size = os.path.getsize(GEOMETRY_FILE)
+
+    print(f"\n✓ Packed {count}/{len(activities)} activities with GPS data")
+    print(f"✓ Saved {GEOMETRY_FILE} ({size/1024:.1f} KB)")
+
+if __name__ == '__main__':
+    main()
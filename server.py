@@ -8,10 +8,187 @@ import http.server
 import socketserver
 import os
 import sys
+import json
+from urllib.parse import urlparse, parse_qs
+from geometry_store import open_geometry_store
+from activity_index import open_activity_index, LOCATION_FACETS
+from activity_schema import load_activities
+from analytics import update_analytics, personal_records
 
 PORT = 8000
 
+# Files next to server.py that hold access tokens and must never be served
+PRIVATE_FILES = ['.env', 'athletes.json']
+PRIVATE_DIRS = ['athletes']
+
+# Memory-mapped activities.geo, shared by all requests and reopened when
+# a sync replaces the file
+geometry_store = None
+
+def get_geometry_store():
+    """Return the current geometry store, remapping it if the file changed."""
+    global geometry_store
+    geometry_store = open_geometry_store(current=geometry_store)
+    return geometry_store
+
+# Bitmap index over activities.json (activities.idx), reloaded after a sync
+activity_index = None
+
+def get_activity_index():
+    """Return the current activity index, reloading it if the file changed."""
+    global activity_index
+    activity_index = open_activity_index(current=activity_index)
+    return activity_index
+
+# Activities and their analytics (activities.analytics.json), loaded on the
+# first /api/records request and refreshed whenever the geometry store changes
+analytics_state = None
+
+def get_analytics():
+    """Return (activities, analytics), recomputing only changed activities after a sync."""
+    global analytics_state
+    store = get_geometry_store()
+    if store is None or not os.path.exists('activities.json'):
+        return None
+    if analytics_state is None or analytics_state[0] != store.file_key:
+        activities = load_activities()
+        # Only the sync scripts write the cache; anything they haven't
+        # analyzed yet is computed here in memory
+        analytics_state = (store.file_key, activities, update_analytics(activities, save=False))
+    return analytics_state[1], analytics_state[2]
+
+def param_list(params, name):
+    """All values of a query parameter, accepting repeats and comma lists."""
+    return [v for value in params.get(name, []) for v in value.split(',') if v]
+
+def param_number(params, name):
+    return float(params[name][0]) if name in params else None
+
 class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/api/geometry':
+            self.handle_geometry(parse_qs(url.query))
+        elif url.path == '/api/query':
+            self.handle_query(parse_qs(url.query))
+        elif url.path == '/api/records':
+            self.handle_records(parse_qs(url.query))
+        else:
+            super().do_GET()
+    
+    def is_private(self, path):
+        """True if path is, or lies inside, one of the private files or dirs."""
+        # Compare (st_dev, st_ino), not path strings: on a case-insensitive
+        # filesystem (macOS) /Athletes.json is the same file as athletes.json
+        private = set()
+        for name in PRIVATE_FILES + PRIVATE_DIRS:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            private.add((stat.st_dev, stat.st_ino))
+        if not private:
+            return False
+        
+        root = os.path.realpath(self.directory)
+        path = os.path.realpath(path)
+        while True:
+            try:
+                stat = os.stat(path)
+                if (stat.st_dev, stat.st_ino) in private:
+                    return True
+            except OSError:
+                pass
+            parent = os.path.dirname(path)
+            if path == root or parent == path:
+                return False
+            path = parent
+    
+    def send_head(self):
+        if self.is_private(self.translate_path(self.path)):
+            self.send_error(404, "File not found")
+            return None
+        return super().send_head()
+    
+    def handle_geometry(self, params):
+        """Serve the decoded coordinates of one activity: /api/geometry?id=123"""
+        store = get_geometry_store()
+        if store is None:
+            self.send_json({'error': 'activities.geo not found'}, status=404)
+            return
+        
+        try:
+            activity_id = int(params['id'][0])
+        except (KeyError, ValueError):
+            self.send_json({'error': 'Missing or invalid id parameter'}, status=400)
+            return
+        
+        if activity_id not in store:
+            self.send_json({'error': f'No geometry for activity {activity_id}'}, status=404)
+            return
+        
+        coordinates = store.coordinates(activity_id)
+        self.send_json({'id': activity_id, 'coordinates': coordinates.tolist()})
+    
+    def handle_query(self, params):
+        """
+        Filter activities: /api/query?sport_type=Run,Hike&after=2024-01-01
+        
+        Parameters: sport_type, city, state, country (repeat or comma-separate
+        to match any of several values), after/before (ISO dates, before is
+        exclusive), min_distance/max_distance (meters), min_time/max_time
+        (moving time in seconds) and limit (max ids to return).
+        """
+        index = get_activity_index()
+        if index is None:
+            self.send_json({'error': 'activities.idx not found'}, status=404)
+            return
+        
+        try:
+            result = index.query(
+                sport_types=param_list(params, 'sport_type'),
+                after=params.get('after', [None])[0],
+                before=params.get('before', [None])[0],
+                min_distance=param_number(params, 'min_distance'),
+                max_distance=param_number(params, 'max_distance'),
+                min_time=param_number(params, 'min_time'),
+                max_time=param_number(params, 'max_time'),
+                locations={
+                    facet: param_list(params, facet[len('location_'):])
+                    for facet in LOCATION_FACETS
+                },
+                limit=int(params['limit'][0]) if 'limit' in params else None,
+            )
+        except ValueError as e:
+            self.send_json({'error': f'Invalid parameter: {e}'}, status=400)
+            return
+        
+        self.send_json(result)
+    
+    def handle_records(self, params):
+        """
+        Records per sport type: /api/records?sport_type=Run
+        
+        Longest activity, most elevation gain and 1k/5k/10k/half marathon
+        times estimated from the fastest average pace (analytics.py). The
+        estimates are not best efforts; polylines carry no timestamps.
+        """
+        state = get_analytics()
+        if state is None:
+            self.send_json({'error': 'activities.geo not found'}, status=404)
+            return
+        
+        activities, analytics = state
+        self.send_json(personal_records(activities, analytics, param_list(params, 'sport_type')))
+    
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
     def end_headers(self):
         # Add CORS headers to allow local file access
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -31,6 +208,18 @@ def main():
         print("your Strava activities before viewing the map.")
         print("\nServer will start anyway, but the map will show an error.")
         print("="*60 + "\n")
+    elif not os.path.exists('activities.geo'):
+        print("Note: activities.geo not found, /api/geometry and /api/records are disabled.")
+        print("Run 'python geometry_store.py' to build it.\n")
+    
+    if os.path.exists('activities.json') and not os.path.exists('activities.idx'):
+        print("Note: activities.idx not found, /api/query is disabled.")
+        print("Run 'python activity_index.py' to build it.\n")
+    
+    # Map the geometry store and load the index once up front. Analytics
+    # need all of activities.json, so they wait for the first /api/records.
+    get_geometry_store()
+    get_activity_index()
     
     Handler = MyHTTPRequestHandler
     
@@ -6,24 +6,43 @@ Run this periodically to keep your map up to date.
 """
 
 import os
-import json
 import requests
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-import polyline
+from activity_schema import activity_from_strava, load_activities, write_activities
+from geometry_store import write_geometry_store
+from activity_index import write_activity_index
+from analytics import update_analytics
+from enrich_locations import enrich_activities, gazetteer_available
 import time
 
 # Disable SSL warnings
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-def load_existing_activities():
+ACTIVITIES_URL = 'https://www.strava.com/api/v3/athlete/activities'
+ACTIVITY_URL = 'https://www.strava.com/api/v3/activities/{}'
+
+def load_existing_activities(path='activities.json'):
     """Load existing activities from JSON file."""
-    if os.path.exists('activities.json'):
-        with open('activities.json', 'r') as f:
-            return json.load(f)
+    if os.path.exists(path):
+        return load_activities(path)
     return []
 
+def save_activities(activities, path='activities.json', workers=None):
+    """Sort activities newest first, save them and rebuild the geometry store, index and analytics."""
+    if gazetteer_available():
+        enrich_activities(activities)
+    
+    activities.sort(key=lambda x: x.get('start_date', ''), reverse=True)
+    write_activities(activities, path)
+    base = os.path.splitext(path)[0]
+    write_geometry_store(activities, base + '.geo')
+    write_activity_index(activities, base + '.idx')
+    # Only new or changed tracks are analyzed; a big first run uses a
+    # process pool unless the caller limits workers
+    update_analytics(activities, base + '.geo', base + '.analytics.json', workers=workers)
+
 def get_latest_activity_date(activities):
     """Get the date of the most recent activity."""
     if not activities:
@@ -33,45 +52,24 @@ def get_latest_activity_date(activities):
              for a in activities if a.get('start_date')]
     return max(dates) if dates else None
 
-def sync_activities():
-    """Sync new activities from Strava."""
-    load_dotenv()
-    
-    client_id = os.getenv('STRAVA_CLIENT_ID')
-    client_secret = os.getenv('STRAVA_CLIENT_SECRET')
-    access_token = os.getenv('STRAVA_ACCESS_TOKEN')
+def fetch_new_activities(access_token, existing_activities, get=requests.get, log=print):
+    """
+    Fetch activities newer than the latest one in existing_activities.
     
-    if not all([client_id, client_secret, access_token]):
-        print("ERROR: Missing credentials. Please run authenticate.py first.")
-        return
-    
-    print("\n" + "="*60)
-    print("SYNCING STRAVA ACTIVITIES")
-    print("="*60)
-    
-    # Load existing activities
-    existing_activities = load_existing_activities()
+    `get` is called like requests.get for every API request, so callers can
+    route requests through their own rate limiting. Returns a tuple of
+    (new_activities, rate_limited).
+    """
     existing_ids = {a['id'] for a in existing_activities}
-    
-    print(f"\nExisting activities: {len(existing_activities)}")
-    
     latest_date = get_latest_activity_date(existing_activities)
-    if latest_date:
-        print(f"Latest activity: {latest_date.strftime('%Y-%m-%d')}")
-        after_timestamp = int(latest_date.timestamp())
-    else:
-        print("No existing activities found. Fetching all activities...")
-        after_timestamp = None
+    after_timestamp = int(latest_date.timestamp()) if latest_date else None
     
     new_activities = []
     headers = {'Authorization': f'Bearer {access_token}'}
+    page = 1
+    per_page = 50
     
     try:
-        page = 1
-        per_page = 50
-        
-        print("\nFetching new activities...")
-        
         while True:
             # Build params
             params = {
@@ -82,19 +80,14 @@ def sync_activities():
                 params['after'] = after_timestamp
             
             # Fetch activities page
-            response = requests.get(
-                'https://www.strava.com/api/v3/athlete/activities',
-                headers=headers,
-                params=params,
-                verify=False
-            )
+            response = get(ACTIVITIES_URL, headers=headers, params=params, verify=False)
             response.raise_for_status()
             activities = response.json()
             
             if not activities:
                 break  # No more activities
             
-            print(f"  Processing page {page} ({len(activities)} activities)...")
+            log(f"  Processing page {page} ({len(activities)} activities)...")
             
             for activity in activities:
                 activity_id = activity['id']
@@ -105,99 +98,87 @@ def sync_activities():
                 
                 try:
                     # Get detailed activity
-                    detail_response = requests.get(
-                        f'https://www.strava.com/api/v3/activities/{activity_id}',
-                        headers=headers,
-                        verify=False
-                    )
+                    detail_response = get(ACTIVITY_URL.format(activity_id), headers=headers, verify=False)
                     detail_response.raise_for_status()
                     detailed = detail_response.json()
-                    
-                    activity_dict = {
-                        'id': activity_id,
-                        'name': activity.get('name', ''),
-                        'type': activity.get('type', ''),
-                        'sport_type': activity.get('sport_type', activity.get('type', '')),
-                        'start_date': activity.get('start_date', ''),
-                        'distance': float(activity.get('distance', 0)),
-                        'moving_time': int(activity.get('moving_time', 0)),
-                        'elapsed_time': int(activity.get('elapsed_time', 0)),
-                        'total_elevation_gain': float(activity.get('total_elevation_gain', 0)),
-                        'start_latlng': activity.get('start_latlng'),
-                        'end_latlng': activity.get('end_latlng'),
-                        'location_city': activity.get('location_city'),
-                        'location_state': activity.get('location_state'),
-                        'location_country': activity.get('location_country'),
-                        'map_polyline': None,
-                        'coordinates': []
-                    }
-                    
-                    # Get polyline
-                    if detailed.get('map') and detailed['map'].get('polyline'):
-                        polyline_str = detailed['map']['polyline']
-                        activity_dict['map_polyline'] = polyline_str
-                        try:
-                            coords = polyline.decode(polyline_str)
-                            activity_dict['coordinates'] = coords
-                        except:
-                            pass
-                    
-                    new_activities.append(activity_dict)
-                    print(f"  ✓ Synced: {activity.get('name', 'Unknown')} ({activity.get('type', 'Unknown')})")
-                    
-                    # Delay to respect rate limits
-                    time.sleep(0.15)
-                    
                 except Exception as e:
                     if '429' in str(e):
-                        print(f"\n⚠️  Rate limit reached!")
-                        print(f"   Synced {len(new_activities)} new activities so far.")
-                        print(f"   Wait 15-20 minutes and run this script again to get more.")
-                        break
-                    else:
-                        print(f"  Warning: Could not fetch details for activity {activity_id}: {e}")
-                        continue
-            
-            # Check if we hit rate limit
-            if '429' in str(response.status_code):
-                break
+                        raise
+                    log(f"  Warning: Could not fetch details for activity {activity_id}: {e}")
+                    continue
+                
+                activity_dict = activity_from_strava(activity, detailed)
+                
+                new_activities.append(activity_dict)
+                existing_ids.add(activity_id)
+                log(f"  ✓ Synced: {activity.get('name', 'Unknown')} ({activity.get('type', 'Unknown')})")
+                
+                # Delay to respect rate limits
+                time.sleep(0.15)
             
             page += 1
             time.sleep(0.5)
-        
-        if new_activities:
-            # Merge with existing
-            all_activities = existing_activities + new_activities
-            
-            # Sort by date (newest first)
-            all_activities.sort(key=lambda x: x.get('start_date', ''), reverse=True)
-            
-            # Save to file
-            with open('activities.json', 'w') as f:
-                json.dump(all_activities, f, indent=2)
-            
-            print(f"\n✓ Synced {len(new_activities)} new activities")
-            print(f"✓ Total activities: {len(all_activities)}")
-            
-            new_with_gps = sum(1 for a in new_activities if a['coordinates'])
-            print(f"✓ New activities with GPS data: {new_with_gps}/{len(new_activities)}")
-        else:
-            print("\n✓ No new activities to sync. You're up to date!")
-        
-    except Exception as e:
+    
+    except requests.exceptions.HTTPError as e:
         if '429' in str(e):
-            print(f"\n⚠️  Rate limit reached!")
-            if new_activities:
-                # Save what we got
-                all_activities = existing_activities + new_activities
-                all_activities.sort(key=lambda x: x.get('start_date', ''), reverse=True)
-                with open('activities.json', 'w') as f:
-                    json.dump(all_activities, f, indent=2)
-                print(f"   Saved {len(new_activities)} new activities.")
-            print(f"   Wait 15-20 minutes and run this script again to get more.")
-        else:
-            print(f"\nERROR: {e}")
-            print("\nIf you're getting an authorization error, try running authenticate.py again.")
+            return new_activities, True
+        raise
+    
+    return new_activities, False
+
+def sync_activities():
+    """Sync new activities from Strava."""
+    load_dotenv()
+    
+    client_id = os.getenv('STRAVA_CLIENT_ID')
+    client_secret = os.getenv('STRAVA_CLIENT_SECRET')
+    access_token = os.getenv('STRAVA_ACCESS_TOKEN')
+    
+    if not all([client_id, client_secret, access_token]):
+        print("ERROR: Missing credentials. Please run authenticate.py first.")
+        return
+    
+    print("\n" + "="*60)
+    print("SYNCING STRAVA ACTIVITIES")
+    print("="*60)
+    
+    # Load existing activities
+    existing_activities = load_existing_activities()
+    
+    print(f"\nExisting activities: {len(existing_activities)}")
+    
+    latest_date = get_latest_activity_date(existing_activities)
+    if latest_date:
+        print(f"Latest activity: {latest_date.strftime('%Y-%m-%d')}")
+    else:
+        print("No existing activities found. Fetching all activities...")
+    
+    print("\nFetching new activities...")
+    
+    try:
+        new_activities, rate_limited = fetch_new_activities(access_token, existing_activities)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        print("\nIf you're getting an authorization error, try running authenticate.py again.")
+        return
+    
+    if new_activities:
+        # Merge with existing and save
+        all_activities = existing_activities + new_activities
+        save_activities(all_activities)
+    
+    if rate_limited:
+        print(f"\n⚠️  Rate limit reached!")
+        print(f"   Saved {len(new_activities)} new activities.")
+        print(f"   Wait 15-20 minutes and run this script again to get more.")
+    elif new_activities:
+        print(f"\n✓ Synced {len(new_activities)} new activities")
+        print(f"✓ Total activities: {len(all_activities)}")
+        
+        new_with_gps = sum(1 for a in new_activities if a['coordinates'])
+        print(f"✓ New activities with GPS data: {new_with_gps}/{len(new_activities)}")
+    else:
+        print("\n✓ No new activities to sync. You're up to date!")
 
 if __name__ == '__main__':
     sync_activities()
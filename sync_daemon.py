@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Strava Sync Daemon
+Long-running alternative to auto-sync-and-deploy.sh.
+
+Keeps your activities in memory between polls, picks the next poll time
+from when you usually upload activities and how much of the Strava rate
+budget is left, and rebuilds dist/ with build_static.py. The site is only
+deployed when the content hash of dist/ differs from the last deploy.
+
+Usage:
+    python sync_daemon.py
+"""
+
+import os
+import sys
+import time
+import hashlib
+import subprocess
+from datetime import datetime, timezone
+import requests
+from dotenv import load_dotenv
+from sync_activities import load_existing_activities, save_activities, fetch_new_activities
+from build_static import build, OUTPUT_DIR
+
+# Disable SSL warnings
+import urllib3
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Source files committed for the github deploy method (CI builds dist/ from them)
+SOURCE_FILES = ['index.html', 'activities-worker.js', 'activities.json']
+HASH_FILE = '.deploy-hash'
+CONFIG_FILE = '.deploy-config'
+
+# Polling bounds in seconds
+MIN_INTERVAL = 10 * 60
+MAX_INTERVAL = 6 * 60 * 60
+
+
+def log(message):
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[{timestamp}] {message.strip()}", flush=True)
+
+
+def hour_of_week(moment):
+    return moment.weekday() * 24 + moment.hour
+
+
+def parse_date(date_string):
+    return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+
+
+def upload_profile(activities):
+    """
+    How often an activity finished in each hour of the week (UTC), as a
+    168-entry list normalised so the busiest hour is 1.0.
+    """
+    counts = [0] * 168
+    for a in activities:
+        if not a.get('start_date'):
+            continue
+        end = parse_date(a['start_date']).timestamp() + a.get('elapsed_time', 0)
+        counts[hour_of_week(datetime.fromtimestamp(end, timezone.utc))] += 1
+
+    busiest = max(counts)
+    return [c / busiest for c in counts] if busiest else [1.0] * 168
+
+
+class RateStatus:
+    """Tracks the rate limit headers Strava sends back with every response."""
+
+    def __init__(self):
+        self.limits = (100, 1000)
+        self.usage = (0, 0)
+
+    def get(self, *args, **kwargs):
+        response = requests.get(*args, **kwargs)
+        try:
+            self.limits = tuple(int(n) for n in response.headers['X-RateLimit-Limit'].split(',')[:2])
+            self.usage = tuple(int(n) for n in response.headers['X-RateLimit-Usage'].split(',')[:2])
+        except (KeyError, ValueError):
+            pass
+        return response
+
+    def remaining_fraction(self):
+        """Share of the daily budget still available (0.0 - 1.0)."""
+        limit_daily, used_daily = self.limits[1], self.usage[1]
+        return max(0.0, (limit_daily - used_daily) / limit_daily) if limit_daily else 0.0
+
+
+def next_interval(profile, rate_status, now=None):
+    """
+    Seconds until the next poll.
+
+    Polls every MIN_INTERVAL during (and right after) the hours you usually
+    finish activities and backs off towards MAX_INTERVAL in quiet hours. The
+    interval is stretched further as the daily rate budget runs low.
+    """
+    now = now or datetime.now(timezone.utc)
+    current = hour_of_week(now)
+    heat = max(profile[current], profile[current - 1])
+
+    interval = MAX_INTERVAL - (MAX_INTERVAL - MIN_INTERVAL) * heat
+
+    remaining = rate_status.remaining_fraction()
+    if remaining < 0.5:
+        interval /= max(remaining * 2, 0.05)
+
+    return int(min(max(interval, MIN_INTERVAL), MAX_INTERVAL))
+
+
+def seconds_until_next_window():
+    """Seconds until Strava's 15-minute rate limit window resets."""
+    return int(900 - time.time() % 900) + 1
+
+
+def refresh_access_token():
+    """Exchange the refresh token for a new access token and save it to .env."""
+    from authenticate import update_env_file
+
+    response = requests.post(
+        'https://www.strava.com/oauth/token',
+        data={
+            'client_id': os.getenv('STRAVA_CLIENT_ID'),
+            'client_secret': os.getenv('STRAVA_CLIENT_SECRET'),
+            'refresh_token': os.getenv('STRAVA_REFRESH_TOKEN'),
+            'grant_type': 'refresh_token',
+        },
+        verify=False
+    )
+    response.raise_for_status()
+    tokens = response.json()
+
+    update_env_file(tokens['access_token'], tokens['refresh_token'])
+    os.environ['STRAVA_ACCESS_TOKEN'] = tokens['access_token']
+    os.environ['STRAVA_REFRESH_TOKEN'] = tokens['refresh_token']
+    return tokens['access_token']
+
+
+def published_hash():
+    """SHA-256 over the names and contents of every file in dist/."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(OUTPUT_DIR):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            digest.update(os.path.relpath(path, OUTPUT_DIR).encode('utf-8') + b'\0')
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_deploy_method():
+    """Read DEPLOY_METHOD from .deploy-config (written by setup-auto-sync.sh)."""
+    if not os.path.exists(CONFIG_FILE):
+        return None
+    with open(CONFIG_FILE, 'r') as f:
+        for line in f:
+            key, _, value = line.strip().partition('=')
+            if key == 'DEPLOY_METHOD':
+                return value.strip('"\'')
+    return None
+
+
+def deploy():
+    """Deploy the site the same way auto-sync-and-deploy.sh does. Returns True on success."""
+    method = load_deploy_method()
+
+    if method == 'netlify-cli':
+        commands = [['netlify', 'deploy', '--prod', f'--dir={OUTPUT_DIR}']]
+    elif method == 'vercel-cli':
+        commands = [['vercel', 'deploy', OUTPUT_DIR, '--prod']]
+    elif method == 'github':
+        commands = [
+            ['git', 'add', *SOURCE_FILES],
+            ['git', 'commit', '-m', f"Auto-update: Strava activities {datetime.now().strftime('%Y-%m-%d')}"],
+            ['git', 'push', 'origin', 'main'],
+        ]
+    else:
+        log("No deployment method configured, skipping deploy.")
+        return False
+
+    log(f"🚀 Deploying ({method})...")
+    for command in commands:
+        # git commit exits 1 when the sources are already committed (e.g. the
+        # daemon restarted on a clean tree); push whatever is unpushed instead
+        if command[:2] == ['git', 'commit'] and subprocess.run(
+            ['git', 'diff', '--cached', '--quiet', '--', *SOURCE_FILES]
+        ).returncode == 0:
+            log("Nothing new to commit, pushing only.")
+            continue
+        if subprocess.run(command).returncode != 0:
+            log(f"❌ Deploy failed: {' '.join(command)}")
+            return False
+    return True
+
+
+def deploy_if_changed(activities):
+    """Rebuild dist/ and deploy only when it differs from the last deploy."""
+    build(activities)
+    current = published_hash()
+
+    last = None
+    if os.path.exists(HASH_FILE):
+        with open(HASH_FILE, 'r') as f:
+            last = f.read().strip()
+
+    if current == last:
+        log("Published files unchanged, skipping deploy.")
+        return
+
+    if deploy():
+        with open(HASH_FILE, 'w') as f:
+            f.write(current)
+        log("✅ Deployed.")
+
+
+def run():
+    load_dotenv()
+
+    if not os.getenv('STRAVA_ACCESS_TOKEN'):
+        print("ERROR: Missing access token. Please run authenticate.py first.")
+        return
+
+    print("\n" + "="*60)
+    print("STRAVA SYNC DAEMON")
+    print("="*60)
+
+    # Loaded once and kept in memory for the life of the daemon
+    activities = load_existing_activities()
+    profile = upload_profile(activities)
+    rate_status = RateStatus()
+
+    log(f"Loaded {len(activities)} activities. Press Ctrl+C to stop.")
+
+    # Catch up on anything that changed while the daemon wasn't running
+    deploy_if_changed(activities)
+
+    while True:
+        wait = None
+        try:
+            new_activities, rate_limited = fetch_new_activities(
+                os.getenv('STRAVA_ACCESS_TOKEN'), activities, get=rate_status.get, log=log
+            )
+        except requests.exceptions.HTTPError as e:
+            new_activities, rate_limited = [], False
+            if e.response is not None and e.response.status_code == 401 and os.getenv('STRAVA_REFRESH_TOKEN'):
+                log("Access token expired, refreshing...")
+                try:
+                    refresh_access_token()
+                    wait = 5
+                except Exception as refresh_error:
+                    log(f"ERROR: Could not refresh access token: {refresh_error}")
+            else:
+                log(f"ERROR: {e}")
+        except Exception as e:
+            new_activities, rate_limited = [], False
+            log(f"ERROR: {e}")
+
+        if new_activities:
+            activities.extend(new_activities)
+            save_activities(activities)
+            profile = upload_profile(activities)
+            log(f"✓ Synced {len(new_activities)} new activities ({len(activities)} total)")
+            deploy_if_changed(activities)
+
+        if wait is None:
+            if rate_limited:
+                log("⚠️  Rate limit reached, waiting for the next window.")
+                wait = max(seconds_until_next_window(), next_interval(profile, rate_status))
+            else:
+                wait = next_interval(profile, rate_status)
+
+        log(f"Next check in {wait // 60} min")
+        time.sleep(wait)
+
+
+def main():
+    # Run from the project directory like server.py does
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        run()
+    except KeyboardInterrupt:
+        print("\n\nSync daemon stopped.")
+        sys.exit(0)
+
+if __name__ == '__main__':
+    main()